@@ -12,6 +12,10 @@ R_earth = 6371e3  # Earth's radius in meters
 M_earth = 5.972e24  # Earth's mass in kg
 mu_earth = G * M_earth  # Earth's standard gravitational parameter, m^3
 B_earth = [3.12e-5, 3.12e-5, 3.12e-5]  # Earth's magnetic field strength at surface, Tesla
+J2 = 1.08263e-3  # Earth's second zonal harmonic (oblateness)
+
+# Sun Constants
+sun_direction = [1, 0, 0]  # Unit vector from Earth to Sun in the inertial frame (held fixed)
 
 # Mathematical Constants
 pi = np.pi  # Pi
@@ -35,9 +35,15 @@ def dynamics(t, state, spacecraft):
     # Calculate quaternion derivative
     dqdt = quaternion_derivative(q, w)
     
+    # Control laws act on the sensed state in closed-loop mode
+    if spacecraft.adcs.closed_loop:
+        q_c, w_c = spacecraft.adcs.determine_attitude(t, q, w)
+    else:
+        q_c, w_c = q, w
+
     # Calculate torque from ADCS (if any)    
-    rw_torque = spacecraft.adcs.rw_control(q, w)
-    mt_torque = spacecraft.adcs.mt_control(w)
+    rw_torque = spacecraft.adcs.rw_control(q_c, w_c)
+    mt_torque = spacecraft.adcs.mt_control(w_c)
     total_torque = rw_torque + mt_torque
 
     # Rotational dynamics (Euler's equation)
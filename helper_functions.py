@@ -77,3 +77,243 @@ def cross_product(a, b):
         a[0]*b[1] - a[1]*b[0]
     ])
 
+
+def quaternion_multiply_batch(q1, q2):
+    """
+    Performs Hamilton product of two arrays of quaternions.
+
+    Args:
+        q1 (np.array): Quaternions of shape (..., 4).
+        q2 (np.array): Quaternions of shape (..., 4).
+
+    Returns:
+        np.array: Products q1 * q2 of shape (..., 4).
+    """
+    w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(q2, -1, 0)
+
+    w = w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2
+    x = w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2
+    y = w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2
+    z = w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2
+
+    return np.stack([w, x, y, z], axis=-1)
+
+def quaternion_to_dcm(q):
+    """
+    Calculates the attitude matrix, which rotates inertial frame vectors into the
+    body frame, from attitude quaternions.
+
+    Args:
+        q (np.array): Attitude quaternions [q0, q1, q2, q3] of shape (..., 4).
+
+    Returns:
+        A (np.array): Attitude matrices of shape (..., 3, 3).
+    """
+    q0, q1, q2, q3 = np.moveaxis(q, -1, 0)
+
+    A = np.empty(np.shape(q)[:-1] + (3, 3))
+    A[..., 0, 0] = q0*q0 + q1*q1 - q2*q2 - q3*q3
+    A[..., 0, 1] = 2 * (q1*q2 + q0*q3)
+    A[..., 0, 2] = 2 * (q1*q3 - q0*q2)
+    A[..., 1, 0] = 2 * (q1*q2 - q0*q3)
+    A[..., 1, 1] = q0*q0 - q1*q1 + q2*q2 - q3*q3
+    A[..., 1, 2] = 2 * (q2*q3 + q0*q1)
+    A[..., 2, 0] = 2 * (q1*q3 + q0*q2)
+    A[..., 2, 1] = 2 * (q2*q3 - q0*q1)
+    A[..., 2, 2] = q0*q0 - q1*q1 - q2*q2 + q3*q3
+
+    return A
+
+def dcm_to_quaternion(A):
+    """
+    Calculates attitude quaternions from attitude matrices (inverse of quaternion_to_dcm),
+    using Shepperd's method to avoid dividing by small numbers.
+
+    Args:
+        A (np.array): Attitude matrices of shape (..., 3, 3).
+
+    Returns:
+        q (np.array): Attitude quaternions [q0, q1, q2, q3] of shape (..., 4) with q0 >= 0.
+    """
+    A = np.asarray(A)
+    trace = A[..., 0, 0] + A[..., 1, 1] + A[..., 2, 2]
+
+    # Candidate solutions, each well conditioned when its leading term is largest
+    candidates = np.stack([
+        np.stack([1 + trace, A[..., 1, 2] - A[..., 2, 1], A[..., 2, 0] - A[..., 0, 2], A[..., 0, 1] - A[..., 1, 0]], axis=-1),
+        np.stack([A[..., 1, 2] - A[..., 2, 1], 1 + 2*A[..., 0, 0] - trace, A[..., 0, 1] + A[..., 1, 0], A[..., 0, 2] + A[..., 2, 0]], axis=-1),
+        np.stack([A[..., 2, 0] - A[..., 0, 2], A[..., 0, 1] + A[..., 1, 0], 1 + 2*A[..., 1, 1] - trace, A[..., 1, 2] + A[..., 2, 1]], axis=-1),
+        np.stack([A[..., 0, 1] - A[..., 1, 0], A[..., 0, 2] + A[..., 2, 0], A[..., 1, 2] + A[..., 2, 1], 1 + 2*A[..., 2, 2] - trace], axis=-1)
+    ], axis=-2)
+
+    diagonal = np.stack([trace, A[..., 0, 0], A[..., 1, 1], A[..., 2, 2]], axis=-1)
+    best = np.argmax(diagonal, axis=-1)
+    q = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    q = q * np.where(q[..., :1] < 0, -1, 1)
+
+    return q
+
+def skew(v):
+    """
+    Calculates the cross product matrices of an array of 3D vectors, such that
+    skew(a) @ b = a x b.
+
+    Args:
+        v (np.array): Vectors of shape (..., 3).
+
+    Returns:
+        np.array: Cross product matrices of shape (..., 3, 3).
+    """
+    x, y, z = np.moveaxis(v, -1, 0)
+    zero = np.zeros_like(x)
+
+    return np.stack([
+        np.stack([zero, -z, y], axis=-1),
+        np.stack([z, zero, -x], axis=-1),
+        np.stack([-y, x, zero], axis=-1)
+    ], axis=-2)
+
+def calculate_a_j2(r):
+    """
+    Calculates the perturbing acceleration due to Earth's oblateness (J2).
+
+    Args:
+        r (np.array): Position vector in meters [x, y, z].
+
+    Returns:
+        np.array: The acceleration vector [ax, ay, az] in m/s^2.
+    """
+    x, y, z = r
+    r_mag = np.linalg.norm(r)
+
+    factor = -1.5 * constants.J2 * constants.mu_earth * constants.R_earth**2 / r_mag**5
+    z2 = 5 * z**2 / r_mag**2
+
+    return factor * np.array([x * (1 - z2), y * (1 - z2), z * (3 - z2)])
+
+def atmospheric_density(altitude, F107, Ap):
+    """
+    Calculates atmospheric density using a simple exponential model whose scale height
+    depends on solar and geomagnetic activity (valid roughly 180-500 km).
+
+    Args:
+        altitude (float or np.array): Altitude above the Earth's surface in meters.
+        F107 (float): Solar radio flux index (10.7 cm) in solar flux units.
+        Ap (float): Geomagnetic index.
+
+    Returns:
+        rho (float or np.array): Density in kg/m^3.
+        H (float or np.array): Scale height in meters.
+    """
+    h = np.asarray(altitude) / 1e3  # km
+
+    T = 900 + 2.5 * (F107 - 70) + 1.5 * Ap  # Exospheric temperature, K
+    m = 27 - 0.012 * (np.clip(h, 180, 500) - 200)  # Mean molecular mass, amu
+    H = T / m  # Scale height, km
+
+    rho = 6e-10 * np.exp(-(h - 175) / H)
+
+    return rho, H * 1e3
+
+def calculate_a_drag(r, v, ballistic_coefficient, F107, Ap):
+    """
+    Calculates the atmospheric drag acceleration, assuming the atmosphere co-rotates with the Earth.
+
+    Args:
+        r (np.array): Position vector in meters [x, y, z].
+        v (np.array): Velocity vector in meters per second [vx, vy, vz].
+        ballistic_coefficient (float): Cd * A / m in m^2/kg.
+        F107 (float): Solar radio flux index (10.7 cm) in solar flux units.
+        Ap (float): Geomagnetic index.
+
+    Returns:
+        np.array: The acceleration vector [ax, ay, az] in m/s^2.
+    """
+    omega_earth = 2 * constants.pi / 86164.0905  # Sidereal rotation rate, rad/s
+    v_rel = v - cross_product([0, 0, omega_earth], r)
+
+    rho, _ = atmospheric_density(np.linalg.norm(r) - constants.R_earth, F107, Ap)
+
+    return -0.5 * rho * ballistic_coefficient * np.linalg.norm(v_rel) * v_rel
+
+def cartesian_to_elements(r, v):
+    """
+    Converts a position and velocity to classical orbital elements.
+
+    Args:
+        r (np.array): Position vector in meters [x, y, z].
+        v (np.array): Velocity vector in meters per second [vx, vy, vz].
+
+    Returns:
+        np.array: Elements [a, e, i, raan, argp, M] (meters and radians).
+    """
+    mu = constants.mu_earth
+    r = np.asarray(r, dtype=float)
+    v = np.asarray(v, dtype=float)
+    r_mag = np.linalg.norm(r)
+
+    h = np.cross(r, v)
+    n = np.cross([0, 0, 1], h)
+    e_vec = np.cross(v, h) / mu - r / r_mag
+
+    a = 1 / (2 / r_mag - v @ v / mu)
+    e = np.linalg.norm(e_vec)
+    i = np.arccos(np.clip(h[2] / np.linalg.norm(h), -1, 1))
+
+    # Equatorial orbits have no node and circular orbits no perigee, use the x axis instead
+    n_mag = np.linalg.norm(n)
+    n_hat = n / n_mag if n_mag > 1e-12 else np.array([1.0, 0.0, 0.0])
+    raan = np.arctan2(n_hat[1], n_hat[0]) % (2 * constants.pi)
+
+    h_hat = h / np.linalg.norm(h)
+    p_hat = e_vec / e if e > 1e-12 else n_hat
+    q_hat = np.cross(h_hat, p_hat)
+    argp = np.arctan2(np.cross(n_hat, p_hat) @ h_hat, n_hat @ p_hat) % (2 * constants.pi)
+
+    # Mean anomaly from the true anomaly
+    nu = np.arctan2(r @ q_hat, r @ p_hat)
+    E = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(nu / 2), np.sqrt(1 + e) * np.cos(nu / 2))
+    M = (E - e * np.sin(E)) % (2 * constants.pi)
+
+    return np.array([a, e, i, raan, argp, M])
+
+def elements_to_cartesian(elements):
+    """
+    Converts classical orbital elements to a position and velocity.
+
+    Args:
+        elements (np.array): Elements [a, e, i, raan, argp, M] (meters and radians).
+
+    Returns:
+        r (np.array): Position vector in meters [x, y, z].
+        v (np.array): Velocity vector in meters per second [vx, vy, vz].
+    """
+    a, e, i, raan, argp, M = elements
+    mu = constants.mu_earth
+
+    # Solve Kepler's equation for the eccentric anomaly
+    E = M if e < 0.8 else constants.pi
+    for _ in range(20):
+        dE = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E -= dE
+        if abs(dE) < 1e-12:
+            break
+
+    # Position and velocity in the perifocal frame
+    r_pf = a * np.array([np.cos(E) - e, np.sqrt(1 - e**2) * np.sin(E), 0])
+    v_pf = np.sqrt(mu * a) / (a * (1 - e * np.cos(E))) * np.array([-np.sin(E), np.sqrt(1 - e**2) * np.cos(E), 0])
+
+    # Rotate perifocal to inertial frame
+    cO, sO = np.cos(raan), np.sin(raan)
+    cw, sw = np.cos(argp), np.sin(argp)
+    ci, si = np.cos(i), np.sin(i)
+    R = np.array([
+        [cO*cw - sO*sw*ci, -cO*sw - sO*cw*ci,  sO*si],
+        [sO*cw + cO*sw*ci, -sO*sw + cO*cw*ci, -cO*si],
+        [sw*si,             cw*si,              ci]
+    ])
+
+    return R @ r_pf, R @ v_pf
@@ -0,0 +1,335 @@
+# File: lifetime
+# This file contains long-horizon orbit propagation for lifetime and decay studies.
+# Mean orbital elements are propagated with orbit-averaged J2 and drag rates, taking steps of
+# many orbits, before switching back to integrating position and velocity for the final decay.
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy as sp
+from scipy.special import ive
+
+import constants
+import spacecraft_config as sc
+from helper_functions import (atmospheric_density, calculate_a_g, calculate_a_j2, calculate_a_drag,
+                              cartesian_to_elements, elements_to_cartesian)
+
+def mean_element_rates(t, elements, ballistic_coefficient, F107, Ap):
+    """
+    Computes the orbit-averaged time derivative of the mean orbital elements, with secular
+    J2 rates and King-Hele drag rates for an exponential atmosphere. Attitude is not
+    modelled, the ballistic coefficient should use an averaged cross-section.
+
+    Args:
+        t (float): Current time in seconds.
+        elements (np.array): Mean elements [a, e, i, raan, argp, M] (meters and radians).
+        ballistic_coefficient (float): Cd * A / m in m^2/kg.
+        F107 (float): Solar radio flux index (10.7 cm) in solar flux units.
+        Ap (float): Geomagnetic index.
+
+    Returns:
+        rates (np.array): Time derivative of the mean elements.
+    """
+    a, e, i = elements[0:3]
+    e = max(e, 0)
+    mu = constants.mu_earth
+
+    n = np.sqrt(mu / a**3)
+    p = a * (1 - e**2)
+    k = constants.J2 * (constants.R_earth / p)**2
+    cos_i = np.cos(i)
+
+    # Drag, averaged over one orbit using the density and scale height at perigee
+    rho_p, H = atmospheric_density(a * (1 - e) - constants.R_earth, F107, Ap)
+    c = a * e / H
+    I0, I1, I2 = ive(0, c), ive(1, c), ive(2, c) # Bessel functions scaled by exp(-c)
+    drag = ballistic_coefficient * rho_p
+
+    rates = np.zeros(6)
+    rates[0] = -drag * np.sqrt(mu * a) * (I0 + 2*e*I1 + 0.75*e**2*(I0 + I2))
+    rates[1] = -drag * np.sqrt(mu / a) * (I1 + 0.5*e*(I0 + I2))
+    rates[3] = -1.5 * n * k * cos_i
+    rates[4] = 0.75 * n * k * (5*cos_i**2 - 1)
+    rates[5] = n + 0.75 * n * k * np.sqrt(1 - e**2) * (3*cos_i**2 - 1)
+
+    return rates
+
+def decay_dynamics(t, state, ballistic_coefficient, F107, Ap):
+    """
+    Computes the time derivative of the position and velocity under gravity, J2 and drag,
+    for the final decay phase. Attitude is not integrated, as drag uses the averaged
+    cross-section and the attitude terms would only limit the step size.
+
+    Args:
+        t (float): Current time in seconds.
+        state (np.array): Current state vector [x, y, z, vx, vy, vz].
+        ballistic_coefficient (float): Cd * A / m in m^2/kg.
+        F107 (float): Solar radio flux index (10.7 cm) in solar flux units.
+        Ap (float): Geomagnetic index.
+
+    Returns:
+        state_derivative (np.array): Time derivative of the state vector.
+    """
+    r = state[0:3]
+    v = state[3:6]
+    a = calculate_a_g(r) + calculate_a_j2(r) + calculate_a_drag(r, v, ballistic_coefficient, F107, Ap)
+
+    return np.hstack([v, a])
+
+def osculating_to_mean(r, v, num_samples=180):
+    """
+    Converts a position and velocity to mean elements by averaging the osculating elements
+    over one orbit of two-body plus J2 motion, which removes the J2 short-period terms.
+    Semi-major axis, eccentricity vector and orbit normal are averaged; the mean anomaly
+    keeps the osculating argument of latitude, since only the phase depends on it.
+
+    Args:
+        r (np.array): Position vector in meters [x, y, z].
+        v (np.array): Velocity vector in meters per second [vx, vy, vz].
+        num_samples (int): Number of samples over the orbit.
+
+    Returns:
+        np.array: Mean elements [a, e, i, raan, argp, M] (meters and radians).
+    """
+    mu = constants.mu_earth
+    osculating = cartesian_to_elements(r, v)
+    period = 2 * constants.pi * np.sqrt(osculating[0]**3 / mu)
+
+    def gravity_j2(t, state):
+        return np.hstack([state[3:6], calculate_a_g(state[0:3]) + calculate_a_j2(state[0:3])])
+
+    orbit = sp.integrate.solve_ivp(
+        gravity_j2,
+        [0, period],
+        np.hstack([r, v]),
+        method = 'DOP853',
+        t_eval = np.linspace(0, period, num_samples, endpoint=False),
+        rtol = 1e-10,
+        atol = 1e-6
+    )
+    r_samples = orbit.y[0:3, :].T
+    v_samples = orbit.y[3:6, :].T
+    r_mag = np.linalg.norm(r_samples, axis=1, keepdims=True)
+
+    h = np.cross(r_samples, v_samples)
+    a = 1 / (2 / r_mag[:, 0] - np.sum(v_samples**2, axis=1) / mu)
+    e_vec = np.cross(v_samples, h) / mu - r_samples / r_mag
+
+    h_hat = np.mean(h / np.linalg.norm(h, axis=1, keepdims=True), axis=0)
+    h_hat /= np.linalg.norm(h_hat)
+    e_vec = np.mean(e_vec, axis=0)
+    e_vec -= (e_vec @ h_hat) * h_hat
+
+    i = np.arccos(np.clip(h_hat[2], -1, 1))
+    n = np.cross([0, 0, 1], h_hat)
+    n_mag = np.linalg.norm(n)
+    n_hat = n / n_mag if n_mag > 1e-12 else np.array([1.0, 0.0, 0.0])
+    raan = np.arctan2(n_hat[1], n_hat[0]) % (2 * constants.pi)
+
+    e = np.linalg.norm(e_vec)
+    argp = np.arctan2(np.cross(n_hat, e_vec) @ h_hat, n_hat @ e_vec) % (2 * constants.pi) if e > 1e-12 else 0.0
+    M = (osculating[4] + osculating[5] - argp) % (2 * constants.pi)
+
+    return np.array([np.mean(a), e, i, raan, argp, M])
+
+def mean_to_osculating(elements, iterations=3):
+    """
+    Converts mean elements to a position and velocity by inverting osculating_to_mean,
+    correcting the semi-major axis, inclination, node and eccentricity vector by fixed-point iteration.
+
+    Args:
+        elements (np.array): Mean elements [a, e, i, raan, argp, M] (meters and radians).
+        iterations (int): Number of correction iterations.
+
+    Returns:
+        r (np.array): Position vector in meters [x, y, z].
+        v (np.array): Velocity vector in meters per second [vx, vy, vz].
+    """
+    def eccentricity_vector(elements):
+        return elements[1] * np.array([np.cos(elements[4]), np.sin(elements[4])])
+
+    target = np.asarray(elements, dtype=float)
+    osculating = target.copy()
+
+    for _ in range(iterations):
+        mean = osculating_to_mean(*elements_to_cartesian(osculating))
+
+        osculating[0] += target[0] - mean[0]
+        osculating[2] += target[2] - mean[2]
+        osculating[3] += (target[3] - mean[3] + constants.pi) % (2 * constants.pi) - constants.pi
+
+        ecc = eccentricity_vector(osculating) + eccentricity_vector(target) - eccentricity_vector(mean)
+        argp = np.arctan2(ecc[1], ecc[0])
+        osculating[5] += osculating[4] - argp
+        osculating[1], osculating[4] = np.linalg.norm(ecc), argp
+
+    return elements_to_cartesian(osculating)
+
+def estimate_lifetime(spacecraft, max_duration=25*constants.seconds_per_year, ballistic_coefficient=None,
+                      F107=sc.F107, Ap=sc.Ap, switch_altitude=120e3, reentry_altitude=100e3,
+                      final_phase=True, max_final_duration=constants.seconds_per_day):
+    """
+    Estimates the orbital lifetime of a spacecraft from its current position and velocity.
+    If the perigee is already at or below switch_altitude, the final phase starts immediately.
+
+    The initial state is converted to mean elements by averaging over one two-body plus J2
+    orbit, and back to a position and velocity at the switch (see osculating_to_mean).
+    Drag and J2 long-period terms are not removed by the conversion.
+
+    Args:
+        spacecraft: Instance of a spacecraft class.
+        max_duration (float): Longest lifetime to propagate for in seconds.
+        ballistic_coefficient (float): Cd * A / m in m^2/kg. Defaults to the configured drag
+            coefficient and averaged cross-section.
+        F107 (float): Solar radio flux index (10.7 cm) in solar flux units.
+        Ap (float): Geomagnetic index.
+        switch_altitude (float): Perigee altitude in meters at which to switch to full orbital
+            dynamics.
+        reentry_altitude (float): Altitude in meters treated as re-entry.
+        final_phase (bool): Whether to integrate the final decay with full orbital dynamics. If
+            False, the lifetime ends when the perigee reaches switch_altitude.
+        max_final_duration (float): Longest final decay phase to integrate for in seconds.
+
+    Returns:
+        lifetime_results (dict): 'lifetime' in seconds (None if the spacecraft outlives
+            max_duration), mean element history 'time' and 'elements', 'switch_time' and the
+            final phase 'decay_results' with 'time', 'position' and 'velocity' (None if not run).
+    """
+    if ballistic_coefficient is None:
+        ballistic_coefficient = sc.Cd * sc.drag_area / spacecraft.mass
+
+    elements0 = osculating_to_mean(spacecraft.r, spacecraft.v)
+
+    lifetime_results = {
+        'lifetime': None,
+        'time': np.zeros(1),
+        'elements': elements0[None, :],
+        'switch_time': None,
+        'decay_results': None
+    }
+
+    # Already low enough for full orbital dynamics (or already re-entered)
+    perigee_altitude = elements0[0] * (1 - elements0[1]) - constants.R_earth
+    if perigee_altitude <= switch_altitude:
+        if perigee_altitude <= 0:
+            lifetime_results['lifetime'] = 0.0
+            return lifetime_results
+
+        lifetime_results['switch_time'] = 0.0
+        if not final_phase:
+            lifetime_results['lifetime'] = 0.0
+            return lifetime_results
+
+        return _decay_phase(lifetime_results, spacecraft.r, spacecraft.v, 0.0, ballistic_coefficient,
+                            F107, Ap, reentry_altitude, max_final_duration)
+
+    def perigee_reached(t, elements, *args):
+        return elements[0] * (1 - elements[1]) - constants.R_earth - switch_altitude
+    perigee_reached.terminal = True
+    perigee_reached.direction = -1
+
+    # Guard so a missed switch can never be reported as survival
+    def surface_reached(t, elements, *args):
+        return elements[0] * (1 - elements[1]) - constants.R_earth
+    surface_reached.terminal = True
+    surface_reached.direction = -1
+
+    # Mean anomaly only sets the phase at the switch, so it does not limit the step size
+    solution = sp.integrate.solve_ivp(
+        mean_element_rates,
+        [0, max_duration],
+        elements0,
+        args = (ballistic_coefficient, F107, Ap),
+        method = 'RK45',
+        events = [perigee_reached, surface_reached],
+        rtol = 1e-6,
+        atol = [1e-1, 1e-8, 1e-9, 1e-6, 1e-6, 1e6]
+    )
+
+    lifetime_results['time'] = solution.t
+    lifetime_results['elements'] = solution.y.T
+
+    if solution.status != 1:
+        return lifetime_results
+
+    if solution.t_events[0].size == 0:
+        lifetime_results['lifetime'] = solution.t_events[1][0]
+        return lifetime_results
+
+    switch_time = solution.t_events[0][0]
+    lifetime_results['switch_time'] = switch_time
+
+    if not final_phase:
+        lifetime_results['lifetime'] = switch_time
+        return lifetime_results
+
+    # Final decay with full orbital dynamics from the switch state
+    elements = solution.y_events[0][0].copy()
+    elements[3:6] %= 2 * constants.pi
+    r, v = mean_to_osculating(elements)
+
+    return _decay_phase(lifetime_results, r, v, switch_time, ballistic_coefficient,
+                        F107, Ap, reentry_altitude, max_final_duration)
+
+def _decay_phase(lifetime_results, r, v, switch_time, ballistic_coefficient,
+                 F107, Ap, reentry_altitude, max_final_duration):
+    """
+    Integrates the final decay from the switch state and fills in lifetime_results,
+    used by estimate_lifetime.
+    """
+    y0 = np.hstack([r, v]).astype(float)
+
+    def reentry(t, state, *args):
+        return np.linalg.norm(state[0:3]) - constants.R_earth - reentry_altitude
+    reentry.terminal = True
+    reentry.direction = -1
+
+    decay = sp.integrate.solve_ivp(
+        decay_dynamics,
+        [switch_time, switch_time + max_final_duration],
+        y0,
+        args = (ballistic_coefficient, F107, Ap),
+        method = 'DOP853',
+        events = reentry,
+        rtol = 1e-9,
+        atol = 1e-3
+    )
+
+    lifetime_results['decay_results'] = {
+        'time': decay.t,
+        'position': decay.y[0:3, :].T,
+        'velocity': decay.y[3:6, :].T
+    }
+
+    if decay.status == 1:
+        lifetime_results['lifetime'] = decay.t_events[0][0]
+
+    return lifetime_results
+
+def _estimate_scenario(spacecraft, scenario, kwargs):
+    """
+    Runs estimate_lifetime for one scenario, used as the worker of estimate_lifetimes.
+    """
+    return estimate_lifetime(spacecraft, **kwargs, **scenario)
+
+def estimate_lifetimes(spacecraft, scenarios, max_workers=None, **kwargs):
+    """
+    Estimates orbital lifetimes for a batch of scenarios in parallel processes.
+
+    Args:
+        spacecraft: Instance of a spacecraft class.
+        scenarios (list): Dictionaries of estimate_lifetime arguments to vary, e.g.
+            {'ballistic_coefficient': 0.02, 'F107': 200, 'Ap': 20}.
+        max_workers (int): Number of worker processes, the number of CPUs if None.
+            Scenarios run serially in this process if 1.
+        **kwargs: Arguments of estimate_lifetime shared by all scenarios.
+
+    Returns:
+        results (list): lifetime_results of each scenario, in the same order.
+    """
+    if max_workers == 1:
+        return [_estimate_scenario(spacecraft, scenario, kwargs) for scenario in scenarios]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_estimate_scenario, spacecraft, scenario, kwargs) for scenario in scenarios]
+        return [future.result() for future in futures]
@@ -24,7 +24,7 @@ I_inv = sc.I_inv # Inverse of inertia matrix
 # Define CubeSat functionality
 
 # ADCS Parameters
-sensors = ['sun_sensor', 'magnetometer']
+sensors = ['sun_sensor', 'magnetometer', 'gyroscope']
 actuators = ['reaction_wheel', 'magnetorquer']
 K_mt = sc.K_mt # Magnetorquer control gain factor
 K_p = sc.K_p  # Reaction wheel proportional gain
@@ -4,7 +4,10 @@
 import numpy as np 
 import scipy as sp
 
+import constants
 from dynamics import dynamics
+from trajectory import Trajectory
+from lifetime import estimate_lifetime, estimate_lifetimes
 
 class Simulator:
   """
@@ -24,16 +27,27 @@ class Simulator:
     self.total_time = total_time
     self.current_time = 0
 
-  def run_simulation(self, duration):
+  def run_simulation(self, duration, dense_output=False, segment_duration=None, cache_size=4, segment_dir=None):
     """
     Runs the simulation for the specified duration.
 
     Args:
       duration (float): Duration to run the simulation in seconds.
+      dense_output (bool): If True, return a Trajectory that can be evaluated at any time
+        instead of results sampled every time_step.
+      segment_duration (float): Length of each dense-output segment in seconds. Defaults to
+        one segment per 3600 seconds. Only used with dense_output.
+      cache_size (int): Number of trajectory segments kept unpacked. Only used with dense_output.
+      segment_dir (str): Directory to store trajectory segments in, a temporary directory
+        removed with the trajectory if None. Only used with dense_output.
 
     Returns: 
-      sim_results: Data structure containing the simulation results. 
+      sim_results: Data structure containing the simulation results, or a Trajectory
+        if dense_output is True.
     """
+    if dense_output:
+      return self._run_dense(duration, segment_duration, cache_size, segment_dir)
+
     num_steps = int(duration / self.time_step)
     print(f"Running simulation for {duration} seconds with {num_steps} steps")
 
@@ -80,7 +94,95 @@ class Simulator:
     print(f"Simulation finished")
 
     return self.sim_results
-   
 
-      
+  def _run_dense(self, duration, segment_duration, cache_size, segment_dir):
+    """
+    Runs the simulation with a single solver, keeping its dense output step by step. Steps are
+    grouped into segments that are handed to the trajectory as each fills up, so memory stays
+    bounded without restarting the integrator (the result matches run_simulation). Segments end
+    at the first solver step after segment_duration has elapsed.
+
+    Args:
+      duration (float): Duration to run the simulation in seconds.
+      segment_duration (float): Length of each segment in seconds.
+      cache_size (int): Number of trajectory segments kept unpacked.
+      segment_dir (str): Directory to store trajectory segments in, or None for a temporary one.
+
+    Returns:
+      trajectory (Trajectory): Lazily evaluated trajectory of the run.
+    """
+    if segment_duration is None:
+      segment_duration = 3600
+
+    print(f"Running simulation for {duration} seconds in dense-output segments of {segment_duration} seconds")
+
+    trajectory = Trajectory(cache_size, segment_dir)
+
+    # Stack state vector
+    y0 = np.hstack([
+      self.spacecraft.r,
+      self.spacecraft.v,
+      self.spacecraft.q,
+      self.spacecraft.w
+    ])
+
+    # Same solver and tolerances as run_simulation, stepped manually
+    solver = sp.integrate.LSODA(
+      lambda t, y: dynamics(t, y, self.spacecraft), # Pass spacecraft object
+      0,
+      y0,
+      duration,
+      rtol = 1e-3,
+      atol = 1e-6
+    )
+
+    ts = [solver.t]
+    interpolants = []
+    while solver.status == 'running':
+      message = solver.step()
+      if solver.status == 'failed':
+        raise RuntimeError(f"Integration failed at {solver.t} s: {message}")
+
+      ts.append(solver.t)
+      interpolants.append(solver.dense_output())
+
+      if solver.t - ts[0] >= segment_duration or solver.status == 'finished':
+        trajectory.add_segment(ts[0], solver.t, sp.integrate.OdeSolution(ts, interpolants))
+        ts = [solver.t]
+        interpolants = []
+
+    # Update spacecraft state to last value
+    self.spacecraft.position = solver.y[0:3]
+    self.spacecraft.velocity = solver.y[3:6]
+    self.spacecraft.attitude = solver.y[6:10]
+    self.spacecraft.angular_velocity = solver.y[10:13]
+
+    print(f"Simulation finished")
+
+    return trajectory
+
+  def run_lifetime(self, max_duration, scenarios=None, max_workers=None, **kwargs):
+    """
+    Runs a long-horizon lifetime estimate, propagating orbit-averaged mean elements
+    and switching to full dynamics for the final decay.
+
+    Args:
+      max_duration (float): Longest lifetime to propagate for in seconds.
+      scenarios (list): Optional dictionaries of ballistic coefficient and solar activity
+        arguments (see lifetime.estimate_lifetime) to run as a parallel batch.
+      max_workers (int): Number of worker processes for scenarios, the number of CPUs if None.
+      **kwargs: Further arguments of lifetime.estimate_lifetime.
+
+    Returns:
+      lifetime_results: Lifetime results, or a list of them if scenarios are given.
+    """
+    print(f"Running lifetime estimate for up to {max_duration / constants.seconds_per_year:.1f} years")
+
+    if scenarios is not None:
+      lifetime_results = estimate_lifetimes(self.spacecraft, scenarios, max_workers, max_duration=max_duration, **kwargs)
+    else:
+      lifetime_results = estimate_lifetime(self.spacecraft, max_duration, **kwargs)
+
+    print(f"Lifetime estimate finished")
 
+    return lifetime_results
@@ -8,6 +8,9 @@ mass = 1.33  # kg
 dimensions = (0.1, 0.1, 0.1)  # meters (1U CubeSat)
 I = np.diag([0.01, 0.01, 0.02])  # Inertia matrix (kg·m²) for a typical CubeSat
 I_inv = np.linalg.inv(I) # Inverse of inertia matrix
+Cd = 2.2  # Drag coefficient
+# Orbit-averaged cross-section of a tumbling box (a quarter of its surface area), m²
+drag_area = (dimensions[0]*dimensions[1] + dimensions[1]*dimensions[2] + dimensions[0]*dimensions[2]) / 2
 
 # --- Initial Conditions ---
 r0 = [7000e3, 0, 0]  # Initial position
@@ -16,9 +19,23 @@ q0 = [1, 0, 0, 0]  # Initial attitude quaternion
 w0 = [0.1, 0, 0]  # Initial angular velocity
 
 # --- ADCS ---
-sensors = ['sun_sensor', 'magnetometer']
+sensors = ['sun_sensor', 'magnetometer', 'gyroscope']
 actuators = ['reaction_wheel', 'magnetorquer']
 K_mt = 100 # Magnetorquer control gain factor
 K_p = 0.1  # Reaction wheel proportional gain
 K_d = 0.1  # Reaction wheel derivative gain
+max_rw_torque = 0.001  # Max reaction wheel torque in both directions, N·m
+max_mag_moment = 1  # Max magnetorquer dipole moment in both directions, A·m²
 
+# --- ADCS Sensors ---
+# noise_std and bias in the sensor's units (unit vector, Tesla, rad/s), bias_walk_std per sqrt(s),
+# resolution is the quantization step and sample_rate in Hz
+sensor_params = {
+  'sun_sensor': {'noise_std': 5e-3, 'bias': [0, 0, 0], 'resolution': 1e-3, 'sample_rate': 10, 'unit_vector': True},
+  'magnetometer': {'noise_std': 1e-7, 'bias': [5e-8, -5e-8, 2e-8], 'resolution': 1e-8, 'sample_rate': 10},
+  'gyroscope': {'noise_std': 1e-4, 'bias': [2e-4, -1e-4, 1e-4], 'bias_walk_std': 1e-6, 'resolution': 1e-5, 'sample_rate': 50}
+}
+
+# --- Lifetime ---
+F107 = 150  # Solar radio flux index (10.7 cm), solar flux units
+Ap = 15  # Geomagnetic index
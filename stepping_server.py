@@ -0,0 +1,492 @@
+# File: stepping_server
+# This file contains an asyncio stepping server for flight-software-in-the-loop testing.
+# Flight software drives the simulation one tick at a time over a local socket, sending
+# actuator commands and receiving state and sensor telemetry, paced against wall-clock time.
+
+import asyncio
+import copy
+import socket
+import struct
+import time
+
+import numpy as np
+
+from constants import B_earth
+from dynamics import dynamics
+from helper_functions import cross_product
+from spacecraft_config import max_rw_torque, max_mag_moment
+
+# --- Binary protocol (little-endian, fixed size messages) ---
+# Every request starts with a header of message type and sequence number, replies echo the sequence number.
+STEP = 1  # Request payload: rw_torque[3] (N·m), mag_moment[3] (A·m²), clipped to the actuator limits. Reply: TELEMETRY
+RESET = 2  # No payload. Reply: TELEMETRY of the initial state
+STATS = 3  # No payload. Reply: STATS
+CLOSE = 4  # No payload. The server closes the connection
+
+HEADER = struct.Struct('<BI')
+COMMAND = struct.Struct('<6d')
+# type, seq, time, state[13], sun_sensor[3], magnetometer[3], gyroscope[3], deadline_missed, saturated, latency (s)
+TELEMETRY = struct.Struct('<BId13d3d3d3dBBd')
+# type, seq, steps, deadline misses, saturated steps, latency mean, p50, p99, max (s)
+STATS_REPLY = struct.Struct('<BIQQQ4d')
+
+SENSOR_NAMES = ('sun_sensor', 'magnetometer', 'gyroscope')
+
+class CommandedActuators:
+  """
+  Stands in for the ADCS within dynamics, applying externally commanded actuator outputs
+  instead of the on-board control laws.
+
+  Attributes:
+    rw_torque (np.array): Commanded reaction wheel torque.
+    mag_moment (np.array): Commanded magnetorquer dipole moment.
+    closed_loop (bool): Always False, commands do not use the attitude estimate.
+  """
+
+  def __init__(self):
+    self.rw_torque = np.zeros(3)
+    self.mag_moment = np.zeros(3)
+    self.closed_loop = False
+
+  def rw_control(self, q, w):
+    return self.rw_torque
+
+  def mt_control(self, w):
+    return cross_product(self.mag_moment, B_earth)
+
+class SteppingServer:
+  """
+  Represents a stepping server that advances a Simulator's spacecraft one control tick per
+  request, using a fixed-step Runge-Kutta 4 integrator of dynamics. The server holds a single
+  simulation and serves one client at a time; further connections are closed while a client
+  is connected, as the busy-wait before each deadline also blocks the event loop.
+
+  Attributes:
+    simulator (Simulator): Simulator whose spacecraft is stepped.
+    dt (float): Simulation time advanced per step in seconds.
+    substeps (int): Number of integrator steps per step.
+    real_time_factor (float): Simulation seconds per wall-clock second, None for as fast as possible.
+    catch_up (bool): Whether steps after a missed deadline run early to make up the lost time.
+    time (float): Current simulation time in seconds.
+    state (np.array): Current state vector.
+    steps (int): Number of steps since the last reset.
+    deadline_misses (int): Number of steps finished after their wall-clock deadline.
+    saturated (bool): Whether the last step's commands exceeded the actuator limits.
+    saturated_steps (int): Number of steps whose commands exceeded the actuator limits.
+
+  Methods:
+    __init__: Initialises the server around a simulator.
+    reset: Returns the simulation to the spacecraft's initial state.
+    step: Advances the simulation by one step with the given actuator commands, clipped to the actuator limits.
+    sensor_telemetry: Returns sensor measurements of the current state.
+    latency_stats: Returns per-step latency statistics.
+    start: Starts listening on a unix socket or local TCP port.
+    serve_forever: Starts the server and serves until cancelled.
+  """
+
+  def __init__(self, simulator, dt, real_time_factor=1.0, substeps=1, history=10000, spin_time=2e-3, catch_up=False):
+    """
+    Initialises the server around a simulator.
+
+    Args:
+      simulator (Simulator): Simulator whose spacecraft is stepped.
+      dt (float): Simulation time advanced per step in seconds.
+      real_time_factor (float): Simulation seconds per wall-clock second (e.g. 1 or 10),
+        None for as fast as possible.
+      substeps (int): Number of integrator steps per step.
+      history (int): Number of recent step latencies kept for statistics.
+      spin_time (float): Final part of each wait before a deadline spent busy-waiting in seconds,
+        as event loop timers can oversleep by about a millisecond.
+      catch_up (bool): Whether steps after a missed deadline run early to make up the lost time.
+        If False, the wall clock is re-anchored at each miss so later steps keep real-time spacing.
+
+    Returns:
+      None
+    """
+    self.simulator = simulator
+    self.dt = dt
+    self.substeps = substeps
+    self.real_time_factor = real_time_factor
+    self.spin_time = spin_time
+    self.catch_up = catch_up
+
+    # Dynamics see the commanded actuators, sensors are taken from the spacecraft's ADCS
+    self.actuators = CommandedActuators()
+    self.sensor_adcs = getattr(simulator.spacecraft, 'adcs', None)
+    self._spacecraft = copy.copy(simulator.spacecraft)
+    self._spacecraft.adcs = self.actuators
+
+    spacecraft = simulator.spacecraft
+    self._initial_state = np.hstack([spacecraft.r, spacecraft.v, spacecraft.q, spacecraft.w]).astype(float)
+
+    self._latencies = np.zeros(history)
+    self._server = None
+    self._client_connected = False
+
+    self.reset()
+
+    return None
+
+  def reset(self):
+    """
+    Returns the simulation to the spacecraft's initial state and restarts the wall clock.
+
+    Returns:
+      None
+    """
+    self.time = 0.0
+    self.state = self._initial_state.copy()
+    self.steps = 0
+    self.deadline_misses = 0
+    self.saturated = False
+    self.saturated_steps = 0
+    self.actuators.rw_torque = np.zeros(3)
+    self.actuators.mag_moment = np.zeros(3)
+    self._wall_start = None
+
+    return None
+
+  def step(self, rw_torque, mag_moment):
+    """
+    Advances the simulation by one step with the given actuator commands, held constant over
+    the step. Commands are clipped to the same limits as the on-board control laws.
+
+    Args:
+      rw_torque (np.array): Commanded reaction wheel torque.
+      mag_moment (np.array): Commanded magnetorquer dipole moment.
+
+    Returns:
+      None
+    """
+    rw_torque = np.asarray(rw_torque, dtype=float)
+    mag_moment = np.asarray(mag_moment, dtype=float)
+
+    self.saturated = bool(np.any(np.abs(rw_torque) > max_rw_torque) or np.any(np.abs(mag_moment) > max_mag_moment))
+    if self.saturated:
+      self.saturated_steps += 1
+
+    self.actuators.rw_torque = np.clip(rw_torque, -max_rw_torque, max_rw_torque)
+    self.actuators.mag_moment = np.clip(mag_moment, -max_mag_moment, max_mag_moment)
+
+    h = self.dt / self.substeps
+    t = self.time
+    y = self.state
+    spacecraft = self._spacecraft
+
+    for _ in range(self.substeps):
+      k1 = dynamics(t, y, spacecraft)
+      k2 = dynamics(t + h/2, y + h/2 * k1, spacecraft)
+      k3 = dynamics(t + h/2, y + h/2 * k2, spacecraft)
+      k4 = dynamics(t + h, y + h * k3, spacecraft)
+      y = y + h/6 * (k1 + 2*k2 + 2*k3 + k4)
+      t += h
+
+    y[6:10] /= np.linalg.norm(y[6:10])
+
+    self.state = y
+    self.time = self.steps * self.dt + self.dt # Avoids accumulating rounding in time
+    self.steps += 1
+
+    return None
+
+  def sensor_telemetry(self):
+    """
+    Returns sensor measurements of the current state, NaN for sensors the spacecraft does not have.
+
+    Returns:
+      sensors (np.array): sun_sensor, magnetometer and gyroscope measurements, shape (9,).
+    """
+    sensors = np.full(9, np.nan)
+    if self.sensor_adcs is None or not hasattr(self.sensor_adcs, 'measure_sensors'):
+      return sensors
+
+    measurements = self.sensor_adcs.measure_sensors(self.time, self.state[6:10], self.state[10:13])
+    for i, name in enumerate(SENSOR_NAMES):
+      if name in measurements:
+        sensors[3*i:3*i + 3] = measurements[name]
+
+    return sensors
+
+  def latency_stats(self):
+    """
+    Returns per-step latency statistics over the recent history.
+
+    Returns:
+      stats (dict): 'steps', 'deadline_misses', 'saturated_steps' and latency 'mean', 'p50', 'p99',
+        'max' in seconds.
+    """
+    recent = self._latencies[:min(self.steps, self._latencies.size)]
+
+    if recent.size == 0:
+      mean = p50 = p99 = maximum = 0.0
+    else:
+      mean = recent.mean()
+      p50, p99 = np.percentile(recent, [50, 99])
+      maximum = recent.max()
+
+    return {
+      'steps': self.steps,
+      'deadline_misses': self.deadline_misses,
+      'saturated_steps': self.saturated_steps,
+      'mean': mean,
+      'p50': p50,
+      'p99': p99,
+      'max': maximum
+    }
+
+  async def start(self, path=None, host='127.0.0.1', port=0):
+    """
+    Starts listening on a unix socket, or a local TCP port if no path is given.
+
+    Args:
+      path (str): Unix socket path.
+      host (str): TCP host, used if path is None.
+      port (int): TCP port, 0 to pick a free one. Used if path is None.
+
+    Returns:
+      address: Socket path or (host, port) being listened on.
+    """
+    if path is not None:
+      self._server = await asyncio.start_unix_server(self._handle, path=path)
+      return path
+
+    self._server = await asyncio.start_server(self._handle, host=host, port=port)
+    return self._server.sockets[0].getsockname()[:2]
+
+  async def serve_forever(self, path=None, host='127.0.0.1', port=0):
+    """
+    Starts the server and serves until cancelled.
+
+    Args:
+      path (str): Unix socket path.
+      host (str): TCP host, used if path is None.
+      port (int): TCP port. Used if path is None.
+
+    Returns:
+      None
+    """
+    address = await self.start(path, host, port)
+    print(f"Stepping server listening on {address}, dt = {self.dt} s, real-time factor = {self.real_time_factor}")
+
+    async with self._server:
+      await self._server.serve_forever()
+
+  async def _wait_until(self, deadline):
+    """
+    Waits until the perf_counter deadline, sleeping first and busy-waiting for the last spin_time.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > self.spin_time:
+      await asyncio.sleep(remaining - self.spin_time)
+
+    while time.perf_counter() < deadline:
+      pass
+
+  async def _handle(self, reader, writer):
+    """
+    Serves requests from one client connection until it closes.
+    """
+    if self._client_connected:
+      writer.close()
+      return
+    self._client_connected = True
+
+    sock = writer.get_extra_info('socket')
+    if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+      sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    try:
+      while True:
+        message_type, seq = HEADER.unpack(await reader.readexactly(HEADER.size))
+
+        if message_type == STEP:
+          command = COMMAND.unpack(await reader.readexactly(COMMAND.size))
+          start = time.perf_counter()
+
+          self.step(command[0:3], command[3:6])
+          sensors = self.sensor_telemetry()
+
+          finished = time.perf_counter()
+          latency = finished - start
+          self._latencies[(self.steps - 1) % self._latencies.size] = latency
+
+          # Each step is due when the wall clock catches up with its simulation time
+          delay = 0.0
+          if self.real_time_factor is not None:
+            if self._wall_start is None:
+              self._wall_start = start
+            delay = self._wall_start + self.time / self.real_time_factor - finished
+            if delay < 0:
+              self.deadline_misses += 1
+              if not self.catch_up:
+                self._wall_start = finished - self.time / self.real_time_factor
+
+          reply = TELEMETRY.pack(STEP, seq, self.time, *self.state, *sensors, delay < 0, self.saturated, latency)
+
+          # Hold the reply until the deadline, so the client runs in real time
+          if delay > 0:
+            await self._wait_until(finished + delay)
+
+          writer.write(reply)
+
+        elif message_type == RESET:
+          self.reset()
+          writer.write(TELEMETRY.pack(RESET, seq, self.time, *self.state, *self.sensor_telemetry(), False, False, 0.0))
+
+        elif message_type == STATS:
+          stats = self.latency_stats()
+          writer.write(STATS_REPLY.pack(STATS, seq, stats['steps'], stats['deadline_misses'],
+                                        stats['saturated_steps'], stats['mean'], stats['p50'], stats['p99'], stats['max']))
+
+        else:
+          break
+
+        await writer.drain()
+
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+      pass
+
+    finally:
+      self._client_connected = False
+      writer.close()
+
+class SteppingClient:
+  """
+  Represents a client of the stepping server, as used by flight software test harnesses.
+
+  Methods:
+    connect: Connects to a stepping server.
+    step: Sends actuator commands and returns the telemetry of the next step.
+    reset: Resets the simulation and returns the initial telemetry.
+    stats: Returns the server's latency statistics.
+    close: Closes the connection.
+  """
+
+  def __init__(self):
+    self._reader = None
+    self._writer = None
+    self._seq = 0
+
+  async def connect(self, path=None, host='127.0.0.1', port=None):
+    """
+    Connects to a stepping server on a unix socket, or a local TCP port if no path is given.
+
+    Args:
+      path (str): Unix socket path.
+      host (str): TCP host, used if path is None.
+      port (int): TCP port, used if path is None.
+
+    Returns:
+      None
+    """
+    if path is not None:
+      self._reader, self._writer = await asyncio.open_unix_connection(path)
+    else:
+      self._reader, self._writer = await asyncio.open_connection(host, port)
+      self._writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    return None
+
+  async def step(self, rw_torque, mag_moment):
+    """
+    Sends actuator commands and returns the telemetry of the next step.
+
+    Args:
+      rw_torque (np.array): Commanded reaction wheel torque.
+      mag_moment (np.array): Commanded magnetorquer dipole moment.
+
+    Returns:
+      telemetry (dict): Step telemetry, see _unpack_telemetry.
+    """
+    self._writer.write(self._header(STEP) + COMMAND.pack(*rw_torque, *mag_moment))
+    return self._unpack_telemetry(await self._reader.readexactly(TELEMETRY.size))
+
+  async def reset(self):
+    """
+    Resets the simulation and returns the initial telemetry.
+
+    Returns:
+      telemetry (dict): Telemetry of the initial state.
+    """
+    self._writer.write(self._header(RESET))
+    return self._unpack_telemetry(await self._reader.readexactly(TELEMETRY.size))
+
+  async def stats(self):
+    """
+    Returns the server's latency statistics.
+
+    Returns:
+      stats (dict): 'steps', 'deadline_misses', 'saturated_steps' and latency 'mean', 'p50', 'p99',
+        'max' in seconds.
+    """
+    self._writer.write(self._header(STATS))
+    values = STATS_REPLY.unpack(await self._reader.readexactly(STATS_REPLY.size))
+
+    return dict(zip(('steps', 'deadline_misses', 'saturated_steps', 'mean', 'p50', 'p99', 'max'), values[2:]))
+
+  async def close(self):
+    """
+    Closes the connection.
+
+    Returns:
+      None
+    """
+    self._writer.write(self._header(CLOSE))
+    await self._writer.drain()
+    self._writer.close()
+    await self._writer.wait_closed()
+
+    return None
+
+  def _header(self, message_type):
+    self._seq += 1
+    return HEADER.pack(message_type, self._seq)
+
+  def _unpack_telemetry(self, data):
+    """
+    Unpacks a TELEMETRY message into a dictionary of time, state, sensors and step diagnostics.
+    """
+    values = TELEMETRY.unpack(data)
+    state = np.array(values[3:16])
+
+    return {
+      'seq': values[1],
+      'time': values[2],
+      'position': state[0:3],
+      'velocity': state[3:6],
+      'attitude': state[6:10],
+      'angular_velocity': state[10:13],
+      'sun_sensor': np.array(values[16:19]),
+      'magnetometer': np.array(values[19:22]),
+      'gyroscope': np.array(values[22:25]),
+      'deadline_missed': bool(values[25]),
+      'saturated': bool(values[26]),
+      'latency': values[27]
+    }
+
+def run_stepping_server(simulator, dt, real_time_factor=1.0, substeps=1, path=None, host='127.0.0.1', port=0,
+                        catch_up=False):
+  """
+  Runs a stepping server around a simulator until interrupted.
+
+  Args:
+    simulator (Simulator): Simulator whose spacecraft is stepped.
+    dt (float): Simulation time advanced per step in seconds.
+    real_time_factor (float): Simulation seconds per wall-clock second, None for as fast as possible.
+    substeps (int): Number of integrator steps per step.
+    path (str): Unix socket path, or None to listen on a local TCP port.
+    host (str): TCP host, used if path is None.
+    port (int): TCP port, used if path is None.
+    catch_up (bool): Whether steps after a missed deadline run early to make up the lost time.
+
+  Returns:
+    None
+  """
+  server = SteppingServer(simulator, dt, real_time_factor, substeps, catch_up=catch_up)
+
+  try:
+    asyncio.run(server.serve_forever(path, host, port))
+  except KeyboardInterrupt:
+    print(f"Stepping server stopped: {server.latency_stats()}")
+
+  return None
@@ -3,10 +3,12 @@
 
 import numpy as np
 
-from helper_functions import quaternion_multiply, cross_product
+from helper_functions import quaternion_multiply, cross_product, quaternion_to_dcm
 
-from constants import B_earth
-from spacecraft_config import K_mt, K_p, K_d
+from constants import B_earth, sun_direction
+from spacecraft_config import K_mt, K_p, K_d, max_rw_torque, max_mag_moment, sensor_params
+from subsystems.sensors import Sensor
+from subsystems.estimation import triad, quest, MEKF
 
 class ADCS:
   """
@@ -15,20 +17,29 @@ class ADCS:
   Attributes:
     sensors (list): List of sensors used for attitude determination.
     actuators (list): List of actuators used for attitude control.
+    sensor_models (dict): Sensor instances for the listed sensors found in sensor_params.
+    estimator (str): Static attitude estimator used by determine_attitude, 'triad' or 'quest'.
+    closed_loop (bool): Whether the control laws act on estimated rather than true state.
 
   Methods:
     __init__: Initialises the ADCS with given sensors and actuators.
-    determine_attitude: Placeholder for attitude determination logic.
-    control_algorithms: Determines control torques based on attitude error and available actuators.
+    determine_attitude: Estimates attitude and angular velocity from simulated sensor measurements.
+    measure_sensors: Simulates a measurement from every sensor model.
+    estimate_trajectory: Runs sensor simulation and attitude estimation over stored trajectories.
+    rw_control: Determines reaction wheel torque.
+    mt_control: Determines magnetorquer torque.
   """
 
-  def __init__(self, sensors, actuators):
+  def __init__(self, sensors, actuators, estimator='quest', closed_loop=False, seed=None):
     """
     Initisalises the ADCS with given sensors and actuators
     
     Args:
       sensors (list): List of sensors used for attitude determination.
       actuators (list): List of actuators used for attitude control.
+      estimator (str): Static attitude estimator used by determine_attitude, 'triad' or 'quest'.
+      closed_loop (bool): Whether the control laws act on estimated rather than true state.
+      seed (int): Seed for the sensor noise.
     
     Returns:
       None
@@ -36,37 +47,152 @@ class ADCS:
 
     self.sensors = sensors
     self.actuators = actuators
+    self.estimator = estimator
+    self.closed_loop = closed_loop
+
+    # Sensor models, each with its own noise stream
+    seeds = np.random.SeedSequence(seed).spawn(len(sensors))
+    self.sensor_models = {name: Sensor(name, **sensor_params[name], seed=s)
+                          for name, s in zip(sensors, seeds) if name in sensor_params}
+
+    # Inertial reference directions for the vector sensors
+    self.sun_ref = np.array(sun_direction, dtype=float) / np.linalg.norm(sun_direction)
+    self.mag_norm = np.linalg.norm(B_earth)
+    self.mag_ref = np.array(B_earth, dtype=float) / self.mag_norm
 
     return None
   
-  def determine_attitude(self):
-    # Placeholder for attitude determination logic
+  def determine_attitude(self, t, q, w):
+    """
+    Function to estimate attitude and angular velocity from simulated sensor measurements
+    of the true state. Attitude is found with the static estimator from the sun sensor and
+    magnetometer, angular velocity from the gyroscope. Quantities without sensors are
+    passed through from truth.
 
-    return None
+    Args:
+      t (float): Current time in seconds.
+      q (np.array): True attitude quaternion.
+      w (np.array): True angular velocity vector.
+
+    Returns:
+      q_est (np.array): Estimated attitude quaternion.
+      w_est (np.array): Estimated angular velocity vector.
     """
-    Function to determine control torques based on attitude error and available actuators.
-    
+    measurements = self.measure_sensors(t, q, w)
+
+    q_est = q
+    if 'sun_sensor' in measurements and 'magnetometer' in measurements:
+      b_sun = measurements['sun_sensor']
+      b_mag = measurements['magnetometer'] / np.linalg.norm(measurements['magnetometer'])
+
+      if self.estimator == 'triad':
+        q_est = triad(b_sun, b_mag, self.sun_ref, self.mag_ref)
+      else:
+        q_est = quest(np.stack([b_sun, b_mag]), np.stack([self.sun_ref, self.mag_ref]), self._vector_weights())
+
+    w_est = measurements.get('gyroscope', w)
+
+    return q_est, w_est
+
+  def measure_sensors(self, t, q, w):
+    """
+    Function to simulate a measurement from every sensor model for the true state.
+
     Args:
-      q (np.array): Current attitude quaternion.
-      w (np.array): Current angular velocity vector.
-    
+      t (float): Current time in seconds.
+      q (np.array): True attitude quaternion.
+      w (np.array): True angular velocity vector.
+
     Returns:
-      rw_torque (np.array): Torque from reaction wheels.
-      mt_torque (np.array): Torque from magnetorquers.      
+      measurements (dict): Measurement of each sensor, keyed by sensor name. Sun sensor
+        and magnetometer measure in the body frame, the magnetometer in Tesla.
     """
-  
-    if 'magnetorquer' in self.actuators:
-      # Simple B-dot algorithm
-      dBdt = np.cross(B_earth, w)
-      K_mt = 100 # Control gain factor
-      mag_moment = np.dot(-K_mt, dBdt) # Magnetic dipole moment according to B-dot algorithm
+    A = quaternion_to_dcm(q)
+
+    truth = {
+      'sun_sensor': A @ self.sun_ref,
+      'magnetometer': A @ self.mag_ref * self.mag_norm,
+      'gyroscope': w
+    }
 
-      mt_torque = np.cross(mag_moment, B_earth)
-    else:
-      mt_torque = np.zeros(3)
-      pass
+    return {name: sensor.measure(t, truth[name]) for name, sensor in self.sensor_models.items()}
 
-    return rw_torque, mt_torque
+  def estimate_trajectory(self, t, q, w, method='mekf', rng=None):
+    """
+    Function to run sensor simulation and attitude estimation over stored trajectories.
+    Leading dimensions of q and w (e.g. Monte Carlo members) are processed at once, each
+    with independent sensor noise.
+
+    Args:
+      t (np.array): Increasing times in seconds, shape (N,).
+      q (np.array): True attitude quaternions, shape (..., N, 4).
+      w (np.array): True angular velocity vectors, shape (..., N, 3).
+      method (str): Estimator to use, 'triad', 'quest' or 'mekf' ('mekf' requires a gyroscope).
+      rng (np.random.Generator): Random generator for the sensor noise, each sensor's own
+        generator (seeded by the ADCS seed) if None.
+
+    Returns:
+      estimates (dict): Estimated 'attitude' quaternions and, for 'mekf', 'gyro_bias',
+        'magnetometer_bias' (of the normalised field direction) and error standard deviations
+        'std' at every time.
+    """
+    if 'sun_sensor' not in self.sensor_models or 'magnetometer' not in self.sensor_models:
+      raise ValueError("Attitude estimation requires a sun_sensor and a magnetometer")
+
+    A = quaternion_to_dcm(np.asarray(q, dtype=float))
+
+    b_sun, new_sun = self.sensor_models['sun_sensor'].sample(t, A @ self.sun_ref, rng)
+    b_mag, new_mag = self.sensor_models['magnetometer'].sample(t, A @ self.mag_ref * self.mag_norm, rng)
+    b_mag = b_mag / np.linalg.norm(b_mag, axis=-1, keepdims=True)
+
+    if method == 'triad':
+      return {'attitude': triad(b_sun, b_mag, self.sun_ref, self.mag_ref)}
+
+    if method == 'quest':
+      b = np.stack([b_sun, b_mag], axis=-2)
+      r = np.stack([self.sun_ref, self.mag_ref])
+      return {'attitude': quest(b, r, self._vector_weights())}
+
+    if method != 'mekf':
+      raise ValueError(f"Unknown estimation method '{method}'")
+    if 'gyroscope' not in self.sensor_models:
+      raise ValueError("MEKF estimation requires a gyroscope")
+
+    gyro_model = self.sensor_models['gyroscope']
+    gyro, _ = gyro_model.sample(t, w, rng)
+
+    # Each gyro sample is held for its sample period, or for a whole step if steps are longer
+    hold_time = 1 / gyro_model.sample_rate
+    if len(t) > 1:
+      hold_time = max(np.median(np.diff(t)), hold_time)
+
+    mekf = MEKF(gyro_model.noise_std * np.sqrt(hold_time), gyro_model.bias_walk_std, self._vector_noise_std(),
+                vector_bias_std=self._vector_bias_std())
+    q_est, bias_est, std, vector_bias = mekf.run(t, gyro, [b_sun, b_mag], [self.sun_ref, self.mag_ref],
+                                                 [new_sun, new_mag])
+
+    return {'attitude': q_est, 'gyro_bias': bias_est, 'magnetometer_bias': vector_bias[..., 1, :], 'std': std}
+
+  def _vector_noise_std(self):
+    """
+    Returns the noise standard deviations of the sun and (normalised) magnetometer directions.
+    """
+    return [self.sensor_models['sun_sensor'].noise_std, self.sensor_models['magnetometer'].noise_std / self.mag_norm]
+
+  def _vector_bias_std(self):
+    """
+    Returns the bias uncertainties of the sun and (normalised) magnetometer directions. Only the
+    magnitude of each configured bias is used, as the estimators are not given its value.
+    """
+    return [np.linalg.norm(self.sensor_models['sun_sensor'].bias),
+            np.linalg.norm(self.sensor_models['magnetometer'].bias) / self.mag_norm]
+
+  def _vector_weights(self):
+    """
+    Returns the QUEST weights of the sun and magnetometer directions. QUEST cannot estimate
+    the biases, so they are counted as noise.
+    """
+    return 1 / (np.square(self._vector_noise_std()) + np.square(self._vector_bias_std()))
 
   def rw_control(self, q, w):
     """
@@ -89,7 +215,6 @@ class ADCS:
     rw_torque = (-K_p * np.sign(q_e[0]) * q_e[1:]) - (K_d * w) # Control law
 
     # Enforce maximum torque
-    max_rw_torque = 0.001 # Max torque value in both directions
     rw_torque = np.clip(rw_torque, -max_rw_torque, max_rw_torque)
   
     return rw_torque
@@ -110,7 +235,6 @@ class ADCS:
     mag_moment = -K_mt * dBdt # Magnetic dipole moment according to B-dot algorithm
 
     # Enforce maximum dipole moment
-    max_mag_moment = 1 # Max dipole moment in both directions
     mag_moment = np.clip(mag_moment, -max_mag_moment, max_mag_moment)
 
     mt_torque = cross_product(mag_moment, B_earth) 
@@ -0,0 +1,299 @@
+#File: estimation
+# This file contains attitude estimation algorithms (TRIAD, QUEST and a multiplicative extended Kalman filter)
+# for the CubeSat simulation. All functions work on batches of measurements at once.
+
+import numpy as np
+
+from helper_functions import quaternion_multiply_batch, quaternion_to_dcm, dcm_to_quaternion, skew
+
+def triad(b1, b2, r1, r2):
+  """
+  Determines attitude from two vector observations using the TRIAD algorithm.
+  The first vector pair is trusted more than the second.
+
+  Args:
+    b1 (np.array): First measured unit vectors in the body frame, shape (..., 3).
+    b2 (np.array): Second measured unit vectors in the body frame, shape (..., 3).
+    r1 (np.array): First reference unit vectors in the inertial frame, shape (..., 3).
+    r2 (np.array): Second reference unit vectors in the inertial frame, shape (..., 3).
+
+  Returns:
+    q (np.array): Attitude quaternions of shape (..., 4).
+  """
+
+  def frame(v1, v2):
+    t1 = v1 / np.linalg.norm(v1, axis=-1, keepdims=True)
+    t2 = np.cross(v1, v2)
+    t2 = t2 / np.linalg.norm(t2, axis=-1, keepdims=True)
+    t3 = np.cross(t1, t2)
+    return np.stack([t1, t2, t3], axis=-1)
+
+  b1, b2, r1, r2 = np.broadcast_arrays(b1, b2, r1, r2)
+  A = frame(b1, b2) @ np.swapaxes(frame(r1, r2), -1, -2)
+
+  return dcm_to_quaternion(A)
+
+def quest(b, r, weights=None, iterations=3):
+  """
+  Determines the attitude that best fits several vector observations (Wahba's problem)
+  using the QUEST algorithm. The maximum eigenvalue is found by Newton-Raphson from the
+  sum of weights. Attitudes close to a 180 degree rotation are poorly conditioned.
+
+  Args:
+    b (np.array): Measured unit vectors in the body frame, shape (..., n, 3).
+    r (np.array): Reference unit vectors in the inertial frame, shape (..., n, 3).
+    weights (np.array): Weight of each observation, shape (n,). Equal weights if None.
+    iterations (int): Number of Newton-Raphson iterations.
+
+  Returns:
+    q (np.array): Attitude quaternions of shape (..., 4).
+  """
+  b, r = np.broadcast_arrays(b, r)
+  n = b.shape[-2]
+  weights = np.full(n, 1 / n) if weights is None else np.asarray(weights, dtype=float)
+
+  # Attitude profile matrix and derived quantities
+  B = np.swapaxes(weights[:, None] * b, -1, -2) @ r
+  S = B + np.swapaxes(B, -1, -2)
+  z = np.einsum('i,...ij->...j', weights, np.cross(b, r))
+  sigma = np.trace(B, axis1=-2, axis2=-1)
+  kappa = (S[..., 1, 1]*S[..., 2, 2] - S[..., 1, 2]*S[..., 2, 1]
+           + S[..., 0, 0]*S[..., 2, 2] - S[..., 0, 2]*S[..., 2, 0]
+           + S[..., 0, 0]*S[..., 1, 1] - S[..., 0, 1]*S[..., 1, 0])
+  delta = np.linalg.det(S)
+
+  Sz = np.einsum('...ij,...j->...i', S, z)
+  a = sigma**2 - kappa
+  b_ = sigma**2 + np.einsum('...i,...i->...', z, z)
+  c = delta + np.einsum('...i,...i->...', z, Sz)
+  d = np.einsum('...i,...i->...', Sz, Sz)
+
+  # Newton-Raphson on the characteristic equation for the maximum eigenvalue
+  lam = np.full(sigma.shape, weights.sum())
+  for _ in range(iterations):
+    f = lam**4 - (a + b_)*lam**2 - c*lam + (a*b_ + c*sigma - d)
+    df = 4*lam**3 - 2*(a + b_)*lam - c
+    lam = lam - f / df
+
+  alpha = lam**2 - sigma**2 + kappa
+  beta = lam - sigma
+  gamma = (lam + sigma)*alpha - delta
+  x = alpha[..., None]*z + beta[..., None]*Sz + np.einsum('...ij,...j->...i', S, Sz)
+
+  # Optimal quaternion has vector part x and scalar part gamma
+  q = np.concatenate([gamma[..., None], x], axis=-1)
+  q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+  q = q * np.where(q[..., :1] < 0, -1, 1)
+
+  return q
+
+class MEKF:
+  """
+  Represents a multiplicative extended Kalman filter estimating attitude and gyro bias
+  from gyro rates and unit vector observations. The filter runs over many trajectories
+  (e.g. Monte Carlo members) at once, stepping through time and vectorising over members.
+  Vector observations with a bias uncertainty get three extra states for a constant bias,
+  which becomes observable as the vector moves in the body frame.
+
+  Attributes:
+    gyro_noise_density (float): Gyro angle random walk in rad/s per sqrt(Hz).
+    gyro_bias_walk_std (float): Gyro bias random walk standard deviation in rad/s per sqrt(s).
+    vector_noise_std (list): Noise standard deviation of each vector observation.
+    attitude_std0 (float): Initial attitude error standard deviation in rad.
+    bias_std0 (float): Initial gyro bias standard deviation in rad/s.
+    vector_bias_std (list): Initial bias standard deviation of each vector observation, 0 for unbiased.
+
+  Methods:
+    __init__: Initialises the filter with its noise parameters.
+    run: Runs the filter over stored measurement histories.
+  """
+
+  def __init__(self, gyro_noise_density, gyro_bias_walk_std, vector_noise_std, attitude_std0=0.1, bias_std0=1e-3,
+               vector_bias_std=None):
+    """
+    Initialises the filter with its noise parameters.
+
+    Args:
+      gyro_noise_density (float): Gyro angle random walk in rad/s per sqrt(Hz). For a sensor with
+        per-sample noise standard deviation sigma whose samples are each held for T seconds,
+        this is sigma * sqrt(T).
+      gyro_bias_walk_std (float): Gyro bias random walk standard deviation in rad/s per sqrt(s).
+      vector_noise_std (list): Noise standard deviation of each (unit) vector observation.
+      attitude_std0 (float): Initial attitude error standard deviation in rad.
+      bias_std0 (float): Initial gyro bias standard deviation in rad/s.
+      vector_bias_std (list): Initial standard deviation of a constant bias in each (unit) vector
+        observation, 0 for none. Biased vectors get bias states, all vectors are unbiased if None.
+
+    Returns:
+      None
+    """
+
+    self.gyro_noise_density = gyro_noise_density
+    self.gyro_bias_walk_std = gyro_bias_walk_std
+    self.vector_noise_std = list(vector_noise_std)
+    self.attitude_std0 = attitude_std0
+    self.bias_std0 = bias_std0
+    self.vector_bias_std = [0.0] * len(self.vector_noise_std) if vector_bias_std is None else list(vector_bias_std)
+
+    return None
+
+  def run(self, t, gyro, vectors, references, new_samples=None, q0=None):
+    """
+    Runs the filter over stored measurement histories.
+
+    Args:
+      t (np.array): Increasing times in seconds, shape (N,).
+      gyro (np.array): Measured angular velocity, shape (..., N, 3).
+      vectors (list): Measured unit vectors in the body frame, each of shape (..., N, 3).
+      references (list): Matching reference unit vectors in the inertial frame, each of shape (3,) or (N, 3).
+      new_samples (list): Boolean masks of shape (N,) marking new samples of each vector,
+        every time step if None.
+      q0 (np.array): Initial attitude quaternions, shape (..., 4). Found with QUEST from the
+        first observations if None.
+
+    Returns:
+      q (np.array): Estimated attitude quaternions, shape (..., N, 4).
+      bias (np.array): Estimated gyro bias, shape (..., N, 3).
+      std (np.array): Standard deviation of the attitude, gyro bias and vector bias errors,
+        shape (..., N, 6 + 3 * number of biased vectors).
+      vector_bias (np.array): Estimated bias of each vector observation, zero for unbiased
+        vectors, shape (..., N, len(vectors), 3).
+    """
+    t = np.asarray(t, dtype=float)
+    gyro = np.asarray(gyro, dtype=float)
+    batch_shape = gyro.shape[:-2]
+    num_steps = t.size
+
+    # Flatten all leading dimensions into a single member axis
+    gyro = gyro.reshape(-1, num_steps, 3)
+    vectors = [np.asarray(v, dtype=float).reshape(-1, num_steps, 3) for v in vectors]
+    references = [np.broadcast_to(np.asarray(ref, dtype=float), (num_steps, 3)) for ref in references]
+    if new_samples is None:
+      new_samples = [np.ones(num_steps, dtype=bool)] * len(vectors)
+    members = gyro.shape[0]
+
+    # State slots of the vector biases after the attitude and gyro bias errors
+    slots = {}
+    for j, bias_std in enumerate(self.vector_bias_std):
+      if bias_std > 0:
+        slots[j] = 6 + 3 * len(slots)
+    num_states = 6 + 3 * len(slots)
+
+    if q0 is None:
+      b = np.stack([v[:, 0] for v in vectors], axis=1)
+      r = np.stack([ref[0] for ref in references], axis=0)
+      q_est = quest(b, r, weights=1 / (np.square(self.vector_noise_std) + np.square(self.vector_bias_std)))
+    else:
+      q_est = np.broadcast_to(np.asarray(q0, dtype=float), batch_shape + (4,)).reshape(members, 4).copy()
+    bias_est = np.zeros((members, 3))
+    vector_bias_est = np.zeros((members, len(vectors), 3))
+
+    P = np.zeros((members, num_states, num_states))
+    P[:, 0:3, 0:3] = self.attitude_std0**2 * np.eye(3)
+    P[:, 3:6, 3:6] = self.bias_std0**2 * np.eye(3)
+    for j, slot in slots.items():
+      P[:, slot:slot + 3, slot:slot + 3] = self.vector_bias_std[j]**2 * np.eye(3)
+    eye3 = np.eye(3)
+
+    q_hist = np.empty((members, num_steps, 4))
+    bias_hist = np.empty((members, num_steps, 3))
+    std_hist = np.empty((members, num_steps, num_states))
+    vector_bias_hist = np.empty((members, num_steps, len(vectors), 3))
+
+    for k in range(num_steps):
+      if k > 0:
+        q_est, P = self._propagate(q_est, bias_est, P, gyro[:, k - 1], t[k] - t[k - 1], eye3)
+
+      available = [j for j in range(len(vectors)) if new_samples[j][k]]
+      if available:
+        q_est, bias_est, vector_bias_est, P = self._update(q_est, bias_est, vector_bias_est, P, available, slots,
+                                                           [vectors[j][:, k] for j in available],
+                                                           [references[j][k] for j in available])
+
+      q_hist[:, k] = q_est
+      bias_hist[:, k] = bias_est
+      std_hist[:, k] = np.sqrt(np.diagonal(P, axis1=-2, axis2=-1))
+      vector_bias_hist[:, k] = vector_bias_est
+
+    q_hist = q_hist.reshape(batch_shape + (num_steps, 4))
+    bias_hist = bias_hist.reshape(batch_shape + (num_steps, 3))
+    std_hist = std_hist.reshape(batch_shape + (num_steps, num_states))
+    vector_bias_hist = vector_bias_hist.reshape(batch_shape + (num_steps, len(vectors), 3))
+
+    return q_hist, bias_hist, std_hist, vector_bias_hist
+
+  def _propagate(self, q_est, bias_est, P, gyro, dt, eye3):
+    """
+    Propagates the attitude estimate and covariance over one time step.
+    """
+    w_est = gyro - bias_est
+
+    # Exact quaternion propagation for constant rate, matching quaternion_derivative
+    angle = np.linalg.norm(w_est, axis=-1)
+    dq = np.concatenate([
+      np.cos(angle * dt / 2)[:, None],
+      w_est * (dt / 2 * np.sinc(angle * dt / (2 * np.pi)))[:, None]
+    ], axis=-1)
+    q_est = quaternion_multiply_batch(dq, q_est)
+    q_est = q_est / np.linalg.norm(q_est, axis=-1, keepdims=True)
+
+    # Error state transition for attitude error and gyro bias error, vector biases are constant
+    Phi = np.broadcast_to(np.eye(P.shape[-1]), P.shape).copy()
+    Phi[:, 0:3, 0:3] = eye3 + skew(w_est) * dt
+    Phi[:, 0:3, 3:6] = -dt * eye3
+
+    sv2 = self.gyro_noise_density**2
+    su2 = self.gyro_bias_walk_std**2
+    Q = np.zeros(P.shape[-2:])
+    Q[0:3, 0:3] = (sv2 * dt + su2 * dt**3 / 3) * eye3
+    Q[0:3, 3:6] = -(su2 * dt**2 / 2) * eye3
+    Q[3:6, 0:3] = -(su2 * dt**2 / 2) * eye3
+    Q[3:6, 3:6] = su2 * dt * eye3
+
+    P = Phi @ P @ np.swapaxes(Phi, -1, -2) + Q
+
+    return q_est, P
+
+  def _update(self, q_est, bias_est, vector_bias_est, P, available, slots, measured, references):
+    """
+    Updates the estimates with the vector observations available at this time step.
+    """
+    A = quaternion_to_dcm(q_est)
+    members = q_est.shape[0]
+    m = len(measured)
+
+    H = np.zeros((members, 3 * m, P.shape[-1]))
+    residual = np.empty((members, 3 * m))
+    R = np.zeros((3 * m, 3 * m))
+    for i, j in enumerate(available):
+      # Biased prediction, renormalised like the measurement
+      predicted = A @ references[i] + vector_bias_est[:, j]
+      norm = np.linalg.norm(predicted, axis=-1)[:, None, None]
+      unit = predicted / norm[:, :, 0]
+      projection = (np.eye(3) - unit[:, :, None] * unit[:, None, :]) / norm
+
+      H[:, 3*i:3*i + 3, 0:3] = projection @ A @ skew(references[i])
+      if j in slots:
+        H[:, 3*i:3*i + 3, slots[j]:slots[j] + 3] = projection
+      residual[:, 3*i:3*i + 3] = measured[i] - unit
+      R[3*i:3*i + 3, 3*i:3*i + 3] = self.vector_noise_std[j]**2 * np.eye(3)
+
+    PHt = P @ np.swapaxes(H, -1, -2)
+    S = H @ PHt + R
+    K = np.swapaxes(np.linalg.solve(S, np.swapaxes(PHt, -1, -2)), -1, -2)
+    dx = np.einsum('...ij,...j->...i', K, residual)
+
+    # Joseph form keeps the covariance symmetric positive definite
+    IKH = np.eye(P.shape[-1]) - K @ H
+    P = IKH @ P @ np.swapaxes(IKH, -1, -2) + K @ R @ np.swapaxes(K, -1, -2)
+
+    # Reset the attitude error into the reference quaternion
+    dq = np.concatenate([np.ones((members, 1)), dx[:, 0:3] / 2], axis=-1)
+    q_est = quaternion_multiply_batch(dq, q_est)
+    q_est = q_est / np.linalg.norm(q_est, axis=-1, keepdims=True)
+    bias_est = bias_est + dx[:, 3:6]
+    vector_bias_est = vector_bias_est.copy()
+    for j, slot in slots.items():
+      vector_bias_est[:, j] += dx[:, slot:slot + 3]
+
+    return q_est, bias_est, vector_bias_est, P
@@ -0,0 +1,182 @@
+#File: sensors
+# This file contains the Sensor class used to model ADCS sensor measurements for the CubeSat simulation.
+
+from collections import OrderedDict
+
+import numpy as np
+
+WALK_BLOCK = 1024 # Number of samples of bias random walk generated at once
+
+class Sensor:
+  """
+  Represents a three-axis sensor with white noise, bias, bias random walk, quantization
+  and a finite sample rate (measurements are held between samples).
+
+  Attributes:
+    name (str): Name of the sensor.
+    noise_std (float): Standard deviation of the white measurement noise per axis.
+    bias (np.array): Constant measurement bias.
+    bias_walk_std (float): Standard deviation of the bias random walk per sqrt(second).
+    resolution (float): Quantization step, 0 for none.
+    sample_rate (float): Sample rate in Hz, None for a new sample at every query.
+    unit_vector (bool): Whether measurements are renormalised to unit length (e.g. sun sensor).
+
+  Methods:
+    __init__: Initialises the sensor with its error model.
+    measure: Returns a single measurement for closed-loop simulation.
+    sample: Returns measurements over whole trajectories at once.
+  """
+
+  def __init__(self, name, noise_std, bias=None, bias_walk_std=0, resolution=0, sample_rate=None, unit_vector=False, seed=None):
+    """
+    Initialises the sensor with its error model.
+
+    Args:
+      name (str): Name of the sensor.
+      noise_std (float): Standard deviation of the white measurement noise per axis.
+      bias (np.array): Constant measurement bias, zero if None.
+      bias_walk_std (float): Standard deviation of the bias random walk per sqrt(second).
+      resolution (float): Quantization step, 0 for none.
+      sample_rate (float): Sample rate in Hz, None for a new sample at every query.
+      unit_vector (bool): Whether measurements are renormalised to unit length.
+      seed (int or np.random.SeedSequence): Seed for the sensor noise.
+
+    Returns:
+      None
+    """
+
+    self.name = name
+    self.noise_std = noise_std
+    self.bias = np.zeros(3) if bias is None else np.array(bias, dtype=float)
+    self.bias_walk_std = bias_walk_std
+    self.resolution = resolution
+    self.sample_rate = sample_rate
+    self.unit_vector = unit_vector
+
+    self._seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    self.rng = np.random.default_rng(self._seed)
+    self._sample_index = None # Index of the held sample
+    self._held_error = np.zeros(3) # Noise and bias walk of the held sample
+    self._walk_starts = [np.zeros(3)] # Bias walk at the start of each block of samples
+    self._walk_blocks = OrderedDict() # Block index -> cumulative bias walk within the block
+
+    return None
+
+  def measure(self, t, truth):
+    """
+    Returns a single measurement of the true value at time t. The noise and bias walk of a
+    sample are deterministic functions of the sample index, so any query within the same
+    sample period, including repeated or out-of-order queries by the integrator, sees the
+    same error. Without a sample rate, every query draws new noise and the bias does not walk.
+
+    Args:
+      t (float): Current time in seconds.
+      truth (np.array): True value being measured, in the body frame.
+
+    Returns:
+      measurement (np.array): Measured value.
+    """
+    if self.sample_rate is None:
+      error = self.noise_std * self.rng.standard_normal(3)
+    else:
+      index = int(np.floor(t * self.sample_rate))
+      if index != self._sample_index:
+        noise = self.noise_std * self._index_rng(0, index).standard_normal(3)
+        self._held_error = noise + self._bias_walk_at(index)
+        self._sample_index = index
+      error = self._held_error
+
+    measurement = np.asarray(truth) + self.bias + error
+
+    return self._finish(measurement)
+
+  def sample(self, t, truth, rng=None):
+    """
+    Returns measurements over whole trajectories at once. Leading dimensions of truth
+    (e.g. Monte Carlo members) are treated independently.
+
+    Args:
+      t (np.array): Increasing times in seconds, shape (N,).
+      truth (np.array): True values in the body frame, shape (..., N, 3).
+      rng (np.random.Generator): Random generator, the sensor's own if None.
+
+    Returns:
+      measurement (np.array): Measured values, shape (..., N, 3).
+      new_sample (np.array): Boolean mask of shape (N,), True where a new sample was taken.
+    """
+    rng = self.rng if rng is None else rng
+    t = np.asarray(t, dtype=float)
+    truth = np.asarray(truth, dtype=float)
+
+    if self.sample_rate is None:
+      new_sample = np.ones(t.size, dtype=bool)
+    else:
+      index = np.floor(t * self.sample_rate)
+      new_sample = np.empty(t.size, dtype=bool)
+      new_sample[0] = True
+      new_sample[1:] = index[1:] > index[:-1]
+
+    # Index of the most recent sample for every time, used to hold values between samples
+    held = np.maximum.accumulate(np.where(new_sample, np.arange(t.size), 0))
+
+    error = self.bias + self.noise_std * rng.standard_normal(truth.shape)
+
+    if self.bias_walk_std > 0:
+      dt = np.diff(t, prepend=t[0])[:, None]
+      error += np.cumsum(self.bias_walk_std * np.sqrt(dt) * rng.standard_normal(truth.shape), axis=-2)
+
+    measurement = (truth + error)[..., held, :]
+
+    return self._finish(measurement), new_sample
+
+  def _index_rng(self, stream, index):
+    """
+    Returns a random generator that depends only on the sensor seed, a stream number and an index.
+    """
+    seed = np.random.SeedSequence(self._seed.entropy, spawn_key=self._seed.spawn_key + (stream, index))
+    return np.random.default_rng(seed)
+
+  def _bias_walk_at(self, index):
+    """
+    Returns the bias random walk at a sample index. Increments are drawn in blocks of
+    WALK_BLOCK samples from generators keyed by the block index, so the walk does not
+    depend on the order of queries.
+    """
+    if self.bias_walk_std == 0 or index < 0:
+      return np.zeros(3)
+
+    block, offset = divmod(index, WALK_BLOCK)
+    while len(self._walk_starts) <= block:
+      previous = len(self._walk_starts) - 1
+      self._walk_starts.append(self._walk_starts[previous] + self._walk_block(previous)[-1])
+
+    return self._walk_starts[block] + self._walk_block(block)[offset]
+
+  def _walk_block(self, block):
+    """
+    Returns the cumulative bias walk within a block of samples, caching recent blocks.
+    """
+    if block in self._walk_blocks:
+      self._walk_blocks.move_to_end(block)
+      return self._walk_blocks[block]
+
+    step_std = self.bias_walk_std * np.sqrt(1 / self.sample_rate)
+    walk = np.cumsum(step_std * self._index_rng(1, block).standard_normal((WALK_BLOCK, 3)), axis=0)
+
+    self._walk_blocks[block] = walk
+    while len(self._walk_blocks) > 2:
+      self._walk_blocks.popitem(last=False)
+
+    return walk
+
+  def _finish(self, measurement):
+    """
+    Applies quantization and renormalisation to raw measurements.
+    """
+    if self.resolution > 0:
+      measurement = np.round(measurement / self.resolution) * self.resolution
+
+    if self.unit_vector:
+      measurement = measurement / np.linalg.norm(measurement, axis=-1, keepdims=True)
+
+    return measurement
@@ -0,0 +1,241 @@
+# File: trajectory
+# This file contains the Trajectory class, a lazily evaluated record of a simulation run
+
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+class Trajectory:
+  """
+  Represents a simulated trajectory as a sequence of dense-output segments that can be
+  evaluated at arbitrary times after the run.
+
+  Each segment holds the solver's interpolant (scipy OdeSolution) over a slice of the run.
+  Segments are written to files under segment_dir and only the most recently queried ones
+  are unpacked, so memory use is bounded by cache_size rather than by the length of the run.
+  Without a segment_dir, a temporary directory is used and removed with the trajectory.
+
+  Attributes:
+    t_start (float): Start time of the trajectory in seconds.
+    t_end (float): End time of the trajectory in seconds.
+    boundaries (np.array): Segment boundary times, length num_segments + 1.
+    cache_size (int): Number of unpacked segments kept in the cache.
+    segment_dir (str): Directory segments are written to.
+
+  Methods:
+    __init__: Initialises an empty trajectory.
+    add_segment: Appends the interpolant of the next segment.
+    state: Evaluates the state vector at a time or array of times.
+    sample: Evaluates the trajectory into the sim_results dictionary format.
+    save: Serialises the trajectory to a single file.
+    load: Restores a trajectory written by save.
+  """
+
+  def __init__(self, cache_size=4, segment_dir=None):
+    """
+    Initialises an empty trajectory.
+
+    Args:
+      cache_size (int): Number of unpacked segments kept in the cache.
+      segment_dir (str): Directory to write segments to. If None, a temporary directory
+        is created and removed when the trajectory is garbage collected.
+
+    Returns:
+      None
+    """
+    self.cache_size = cache_size
+    self.boundaries = np.zeros(0)
+
+    self._segments = [] # Paths to the pickled interpolants
+    self._cache = OrderedDict() # Segment index -> unpacked interpolant
+
+    if segment_dir is None:
+      segment_dir = tempfile.mkdtemp(prefix='trajectory_')
+      weakref.finalize(self, shutil.rmtree, segment_dir, ignore_errors=True)
+    else:
+      os.makedirs(segment_dir, exist_ok=True)
+    self.segment_dir = segment_dir
+
+    return None
+
+  @property
+  def t_start(self):
+    return self.boundaries[0]
+
+  @property
+  def t_end(self):
+    return self.boundaries[-1]
+
+  @property
+  def num_segments(self):
+    return len(self._segments)
+
+  def add_segment(self, t0, t1, interpolant):
+    """
+    Appends the interpolant of the next segment. Segments must be added in time order
+    and be contiguous.
+
+    Args:
+      t0 (float): Start time of the segment in seconds.
+      t1 (float): End time of the segment in seconds.
+      interpolant: Callable returning the state vector(s) at given time(s), e.g. solution.sol.
+
+    Returns:
+      None
+    """
+    if self.num_segments == 0:
+      self.boundaries = np.array([t0, t1], dtype=float)
+    elif not np.isclose(t0, self.boundaries[-1]):
+      raise ValueError(f"Segment starting at {t0} s does not follow the trajectory end at {self.boundaries[-1]} s")
+    else:
+      self.boundaries = np.append(self.boundaries, t1)
+
+    path = os.path.join(self.segment_dir, f"segment_{self.num_segments:05d}.pkl")
+    with open(path, 'wb') as f:
+      pickle.dump(interpolant, f, protocol=pickle.HIGHEST_PROTOCOL)
+    self._segments.append(path)
+
+    # The segment being written is usually the next one queried
+    self._cache_put(self.num_segments - 1, interpolant)
+
+    return None
+
+  def state(self, t):
+    """
+    Evaluates the state vector at a time or array of times. Attitude quaternions are
+    renormalised before they are returned.
+
+    Args:
+      t (float or np.array): Time(s) in seconds within [t_start, t_end].
+
+    Returns:
+      state (np.array): State vector of shape (13,) for a scalar time, or (len(t), 13).
+    """
+    if self.num_segments == 0:
+      raise ValueError("Trajectory has no segments")
+
+    t = np.asarray(t, dtype=float)
+    scalar = t.ndim == 0
+    t = np.atleast_1d(t)
+
+    if np.any(t < self.t_start) or np.any(t > self.t_end):
+      raise ValueError(f"Requested times outside trajectory span [{self.t_start}, {self.t_end}] s")
+
+    # Segment index for every requested time, boundary times belong to the later segment
+    index = np.searchsorted(self.boundaries, t, side='right') - 1
+    index = np.clip(index, 0, self.num_segments - 1)
+
+    state = np.empty((t.size, 13))
+    for i in np.unique(index):
+      mask = index == i
+      state[mask] = self._segment(i)(t[mask]).T
+
+    state[:, 6:10] /= np.linalg.norm(state[:, 6:10], axis=1, keepdims=True)
+
+    return state[0] if scalar else state
+
+  def __call__(self, t):
+    return self.state(t)
+
+  def sample(self, t):
+    """
+    Evaluates the trajectory into the sim_results dictionary format used by the
+    visualisation functions.
+
+    Args:
+      t (np.array): Times in seconds to evaluate the trajectory at.
+
+    Returns:
+      sim_results (dict): Time, position, velocity, attitude and angular velocity arrays.
+    """
+    t = np.asarray(t, dtype=float)
+    state = self.state(t).reshape(-1, 13)
+
+    sim_results = {
+      'time': np.atleast_1d(t),
+      'position': state[:, 0:3],
+      'velocity': state[:, 3:6],
+      'attitude': state[:, 6:10],
+      'angular_velocity': state[:, 10:13]
+    }
+
+    return sim_results
+
+  def save(self, path):
+    """
+    Serialises the trajectory, including all segments, to a single file. Segments are
+    written one at a time, so saving does not hold the whole trajectory in memory.
+
+    Args:
+      path (str): File to write to.
+
+    Returns:
+      None
+    """
+    with open(path, 'wb') as f:
+      pickle.dump(self.boundaries, f, protocol=pickle.HIGHEST_PROTOCOL)
+      for i in range(self.num_segments):
+        pickle.dump(self._segment_blob(i), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return None
+
+  @classmethod
+  def load(cls, path, cache_size=4, segment_dir=None):
+    """
+    Restores a trajectory written by save.
+
+    Args:
+      path (str): File to read from.
+      cache_size (int): Number of unpacked segments kept in the cache.
+      segment_dir (str): Directory to write segments to. If None, a temporary directory is used.
+
+    Returns:
+      trajectory (Trajectory): The restored trajectory.
+    """
+    trajectory = cls(cache_size, segment_dir)
+
+    with open(path, 'rb') as f:
+      trajectory.boundaries = np.asarray(pickle.load(f), dtype=float)
+
+      for i in range(len(trajectory.boundaries) - 1):
+        segment_path = os.path.join(trajectory.segment_dir, f"segment_{i:05d}.pkl")
+        with open(segment_path, 'wb') as segment_file:
+          segment_file.write(pickle.load(f))
+        trajectory._segments.append(segment_path)
+
+    return trajectory
+
+  def _segment_blob(self, i):
+    """
+    Returns the pickled interpolant of segment i.
+    """
+    with open(self._segments[i], 'rb') as f:
+      return f.read()
+
+  def _segment(self, i):
+    """
+    Returns the unpacked interpolant of segment i, loading it into the cache if needed.
+    """
+    if i in self._cache:
+      self._cache.move_to_end(i)
+      return self._cache[i]
+
+    interpolant = pickle.loads(self._segment_blob(i))
+    self._cache_put(i, interpolant)
+
+    return interpolant
+
+  def _cache_put(self, i, interpolant):
+    """
+    Adds an interpolant to the cache, evicting the least recently used one if full.
+    """
+    self._cache[i] = interpolant
+    self._cache.move_to_end(i)
+
+    while len(self._cache) > max(self.cache_size, 1):
+      self._cache.popitem(last=False)